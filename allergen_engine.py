@@ -1,9 +1,10 @@
 import re
 import json
-import difflib
-from unicodedata import normalize as ud_normalize
+from unicodedata import normalize as ud_normalize, category
 from typing import List, Dict, Any
 
+from term_matcher import TermMatcher, Term, SUBSTRING, WORD_START, WHOLE_WORD
+
 # =============================================================================
 # 1. THE ALLERGEN DATABASE (Personalized Risks)
 # =============================================================================
@@ -189,18 +190,151 @@ HAZARD_ONTOLOGY = {
 }
 
 # =============================================================================
-# 3. TEXT NORMALIZATION ENGINE
+# 3. LOCALIZED TERM TABLES (EU & Indian labels)
+# =============================================================================
+# Per-language terms for ALLERGEN_ONTOLOGY keys. Written as printed on the pack;
+# they go through normalize_text() when the matcher is compiled, so accents and
+# case don't matter. Unlike the English ontology they never match fuzzily, and
+# outside German/Dutch compounds only on word boundaries (see _i18n_boundary),
+# so "apio" can't fire inside "tapioca" - run regression_check.py after editing them.
+ALLERGEN_TERMS_I18N = {
+    "de": {
+        "milk": ["milch", "sahne", "käse", "molke", "quark", "joghurt", "milchzucker", "butterschmalz", "magermilchpulver"],
+        # Not "eiweiß": it also means protein in general (Milcheiweiß, Erbseneiweiß)
+        "egg": ["eier", "eigelb", "eiklar", "hühnerei", "vollei"],
+        "peanut": ["erdnuss", "erdnüsse"],
+        "tree_nut": ["mandel", "haselnuss", "walnuss", "cashewkern", "pistazie", "paranuss", "pekannuss", "macadamianuss"],
+        "soy": ["soja", "sojabohne", "sojalecithin"],
+        "wheat_gluten": ["weizen", "weizenmehl", "gerste", "roggen", "hafer", "dinkel", "grieß"],
+        "fish": ["fisch", "lachs", "thunfisch", "sardelle", "kabeljau"],
+        "shellfish": ["krebstiere", "garnele", "hummer", "krabbe", "languste"],
+        "mollusk": ["weichtiere", "muschel", "tintenfisch"],
+        "sesame": ["sesam"],
+        "mustard": ["senf", "senfsaat"],
+        "celery": ["sellerie"],
+        "sulfite": ["schwefeldioxid", "sulfit"]
+    },
+    "fr": {
+        "milk": ["lait", "crème", "beurre", "fromage", "lactosérum", "babeurre"],
+        "egg": ["oeuf", "œuf", "oeufs", "œufs"],
+        "peanut": ["arachide", "cacahuète"],
+        "tree_nut": ["amande", "noisette", "noix", "noix de cajou", "pistache", "noix de pécan"],
+        "soy": ["soja"],
+        "wheat_gluten": ["farine de blé", "froment", "orge", "seigle", "avoine", "épeautre"],
+        "fish": ["poisson", "saumon", "thon", "anchois", "morue", "cabillaud"],
+        "shellfish": ["crustacés", "crevette", "crabe", "homard", "langoustine"],
+        "mollusk": ["mollusques", "moules", "huître", "calmar", "poulpe"],
+        "sesame": ["sésame"],
+        "mustard": ["moutarde"],
+        "celery": ["céleri"],
+        "lupin": ["lupin"],
+        "sulfite": ["anhydride sulfureux", "sulfites"]
+    },
+    "es": {
+        "milk": ["leche", "nata", "queso", "mantequilla", "suero de leche"],
+        "egg": ["huevo", "huevos", "yema"],
+        "peanut": ["cacahuete", "cacahuate"],
+        "tree_nut": ["almendra", "avellana", "nuez", "anacardo", "pistacho"],
+        "soy": ["soja"],
+        "wheat_gluten": ["trigo", "cebada", "centeno", "avena", "espelta"],
+        "fish": ["pescado", "salmón", "atún", "anchoa", "bacalao"],
+        "shellfish": ["crustáceos", "gamba", "camarón", "langostino", "cangrejo"],
+        "mollusk": ["moluscos", "mejillón", "almeja", "calamar", "pulpo"],
+        "sesame": ["sésamo", "ajonjolí"],
+        "mustard": ["mostaza"],
+        "celery": ["apio"],
+        "sulfite": ["dióxido de azufre", "sulfitos"]
+    },
+    "it": {
+        "milk": ["latte", "panna", "formaggio", "burro", "siero di latte"],
+        "egg": ["uova", "uovo", "tuorlo"],
+        "peanut": ["arachidi"],
+        "tree_nut": ["mandorle", "nocciole", "noci", "anacardi", "pistacchi"],
+        "soy": ["soia"],
+        "wheat_gluten": ["frumento", "grano", "orzo", "segale", "avena"],
+        "fish": ["pesce", "salmone", "tonno", "acciughe", "merluzzo"],
+        "shellfish": ["crostacei", "gamberi", "granchio", "aragosta"],
+        "mollusk": ["molluschi", "cozze", "vongole", "polpo"],
+        "sesame": ["sesamo"],
+        "mustard": ["senape"],
+        "celery": ["sedano"],
+        "sulfite": ["anidride solforosa", "solfiti"]
+    },
+    "nl": {
+        "milk": ["melk", "kaas", "boter", "karnemelk"],
+        # Not "eiwit": it also means protein in general (melkeiwit, erwteneiwit)
+        "egg": ["eieren", "eigeel", "kippenei"],
+        "peanut": ["pinda", "aardnoot"],
+        "tree_nut": ["amandel", "hazelnoot", "walnoot", "cashewnoot"],
+        "soy": ["soja"],
+        "wheat_gluten": ["tarwe", "gerst", "rogge", "haver"],
+        "fish": ["zalm", "tonijn", "ansjovis", "kabeljauw"],
+        "shellfish": ["schaaldieren", "garnaal", "garnalen", "kreeft", "krab"],
+        "mollusk": ["weekdieren", "mosselen", "oester", "inktvis"],
+        "sesame": ["sesamzaad"],
+        "mustard": ["mosterd"],
+        "celery": ["selderij"],
+        "sulfite": ["zwaveldioxide", "sulfiet"]
+    },
+    "hi": {
+        "milk": ["दूध", "दही", "मक्खन", "घी", "पनीर", "खोया"],
+        "egg": ["अंडा", "अंडे"],
+        "peanut": ["मूंगफली"],
+        "tree_nut": ["बादाम", "काजू", "अखरोट", "पिस्ता"],
+        "soy": ["सोया"],
+        "wheat_gluten": ["गेहूं", "गेहूँ", "मैदा", "आटा", "सूजी"],
+        "fish": ["मछली"],
+        "shellfish": ["झींगा", "केकड़ा"],
+        "sesame": ["तिल"],
+        "mustard": ["सरसों", "राई"],
+        "celery": ["अजमोद"]
+    },
+    # Romanized Hindi, as printed on many Indian packs
+    "hi_latn": {
+        "milk": ["doodh", "dahi", "makhan", "khoya", "malai"],
+        "peanut": ["moongphali", "mungfali"],
+        "tree_nut": ["badam", "kaju", "akhrot", "pista"],
+        "wheat_gluten": ["gehun", "maida", "atta", "sooji", "suji"],
+        "fish": ["machli", "machhli"],
+        "shellfish": ["jhinga"],
+        "mustard": ["sarson"]
+    }
+}
+
+# =============================================================================
+# 4. TEXT NORMALIZATION ENGINE
 # =============================================================================
+# Non-Latin list separators (CJK, Arabic, Devanagari danda) -> comma
+LIST_SEPARATORS = {"、": ",", "，": ",", "،": ",", "।": ","}
+
 def normalize_text(text: str) -> str:
-    """Cleans OCR errors (1->i, 0->o, etc) to ensure accurate matching."""
+    """
+    Cleans OCR errors (1->i, 0->o, etc) to ensure accurate matching.
+    Language-aware: Latin accents are folded (crème -> creme, ß -> ss),
+    other scripts (e.g. Devanagari) keep their letters and vowel signs.
+    """
     if not text: return ""
-    text = text.lower()
+    text = text.casefold()
     # Leetspeak fix for OCR
     replacements = {"1": "i", "0": "o", "|": "l", "@": "a", "(": "", ")": "", "[": "", "]": "", "{": "", "}": ""}
+    replacements.update(LIST_SEPARATORS)
     for k, v in replacements.items():
         text = text.replace(k, v)
-    # Remove non-alphanumeric but keep spaces/commas
-    text = re.sub(r'[^a-z0-9, \n]', '', text)
+    # Fold accents on Latin letters only; Indic vowel signs are combining marks too
+    kept = []
+    base_is_latin = False
+    for ch in ud_normalize("NFKD", text):
+        if category(ch).startswith("M"):
+            if base_is_latin: continue
+        else:
+            base_is_latin = ch < "\u0250"
+        kept.append(ch)
+    text = ud_normalize("NFC", "".join(kept))
+    # Hyphen/slash between letters separate words (bio-soja, soja/weizen); localized
+    # terms match on word boundaries. Codes keep their glue: e-220 -> e220
+    text = re.sub(r"(?<=[^\W\d_])[-/](?=[^\W\d_])", " ", text)
+    # Remove non-alphanumeric (any script) but keep spaces/commas
+    text = "".join(ch for ch in text if ch.isalnum() or category(ch).startswith("M") or ch in ", \n")
     return text.strip()
 
 def extract_ingredients_section(ocr_text: str) -> str:
@@ -209,9 +343,10 @@ def extract_ingredients_section(ocr_text: str) -> str:
     
     # IMPROVED REGEX: Captures "INGIEDIENTS", "INGREDENTS", "INGREDIEN T S"
     # The [i1l] matches I, 1, or l. The .* allows for spaces/typos in the middle.
-    header_pattern = re.compile(r'([i1l]n.*gr[ea]d.*ents?|contains|composition)', re.IGNORECASE)
+    header_pattern = re.compile(r'([i1l]n.*gr[eaé]d.*ents?|contains|composition|zutaten|samenstelling|सामग्री)', re.IGNORECASE)
     
-    stop_words = ["nutrition", "produced", "manufactured", "mfg", "exp", "net weight", "best before"]
+    stop_words = ["nutrition", "produced", "manufactured", "mfg", "exp", "net weight", "best before",
+                  "nährwert", "nutricional", "nutrizional", "voedingswaarde", "पोषण"]
     
     start_index = -1
     for i, line in enumerate(lines):
@@ -231,6 +366,9 @@ def extract_ingredients_section(ocr_text: str) -> str:
         
     return " ".join(relevant_text)
 
+# "and" in the label languages above (single-letter ones like 'e'/'y' are too ambiguous)
+CONJUNCTIONS = ["and", "und", "et", "en", "और"]
+
 def split_ingredients_list(text: str) -> List[str]:
     # 1. Normalize (Fix I/1, O/0)
     text = normalize_text(text)
@@ -238,86 +376,127 @@ def split_ingredients_list(text: str) -> List[str]:
     # 2. CRITICAL FIX: Add space after commas if missing (e.g. "Maltose,Corn" -> "Maltose, Corn")
     text = re.sub(r',(?=\S)', ', ', text)
     
-    # 3. Replace 'and' with comma
-    text = re.sub(r'\s+and\s+', ', ', text)
+    # 3. Replace 'and' (in any supported language) with comma
+    text = re.sub(r'\s+(?:' + '|'.join(CONJUNCTIONS) + r')\s+', ', ', text)
     
     # 4. Split
     items = [x.strip() for x in text.split(',') if len(x.strip()) > 1]
     return items
 # =============================================================================
-# 4. CORE DETECTION LOGIC
+# 5. CORE DETECTION LOGIC
 # =============================================================================
-def detect_allergens_from_ingredient_items(items: List[str], user_allergens: List[str]) -> Dict[str, Any]:
-    
-    detected_allergens = {}
-    detected_hazards = {} 
-    found_personal_risk = False
-    found_hazard_risk = False
-    
-    # 1. PREPARE USER PROFILE
+# Bump MATCHER_VERSION whenever detection semantics change (normalize_text, the
+# matcher, how terms are compiled). Persisted match results are keyed on it.
+MATCHER_VERSION = 4
+
+# Safe Fuzzy Match (Only for long words > 4 chars)
+ALLERGEN_FUZZY_MIN_LEN = 4
+ALLERGEN_FUZZY_RATIO = 0.85
+# Looser Fuzzy match for chemicals: len > 3 catches "BHT", "Red 40"; 0.80 catches typos
+HAZARD_FUZZY_MIN_LEN = 3
+HAZARD_FUZZY_RATIO = 0.80
+
+# Lookup structures derived from the ontology, built once at import.
+# With a preloading server they are created before fork and shared copy-on-write.
+# German and Dutch glue words together at either end (vollmilchpulver, frischkäse,
+# roomkaas), so their terms may sit anywhere inside a word; elsewhere a term has to start one
+COMPOUNDING_LANGUAGES = {"de", "nl"}
+# Shorter localized terms are too ambiguous to run on into a longer word
+I18N_SHORT_TERM_LEN = 5
+# Compounds that contain a localized term but are not that allergen
+I18N_TERM_EXCEPTIONS = {
+    "milch": ["milchsäure"],  # lactic acid
+    "melk": ["melkzuur"],     # lactic acid
+}
+
+def _i18n_boundary(lang: str, term: str) -> str:
+    if lang in COMPOUNDING_LANGUAGES:
+        return SUBSTRING
+    return WORD_START if len(term) >= I18N_SHORT_TERM_LEN else WHOLE_WORD
+
+def _compile_allergen_matcher() -> TermMatcher:
+    entries = []
+    for key, data in ALLERGEN_ONTOLOGY.items():
+        for term in data['terms'] + data['aliases']:
+            entries.append(Term(normalize_text(term), key))
+    for lang, table in ALLERGEN_TERMS_I18N.items():
+        for key, terms in table.items():
+            for raw_term in terms:
+                term = normalize_text(raw_term)
+                exceptions = tuple(normalize_text(word) for word in I18N_TERM_EXCEPTIONS.get(raw_term, []))
+                # Short foreign words make poor fuzzy targets ("pita" ~ "pista")
+                entries.append(Term(term, key, boundary=_i18n_boundary(lang, term), fuzzy=False, exceptions=exceptions))
+    return TermMatcher(entries, fuzzy_min_len=ALLERGEN_FUZZY_MIN_LEN, fuzzy_ratio=ALLERGEN_FUZZY_RATIO)
+
+def _compile_hazard_matcher() -> TermMatcher:
+    entries = [Term(normalize_text(term), h_key) for h_key, h_data in HAZARD_ONTOLOGY.items() for term in h_data['terms']]
+    return TermMatcher(entries, fuzzy_min_len=HAZARD_FUZZY_MIN_LEN, fuzzy_ratio=HAZARD_FUZZY_RATIO)
+
+# One matcher per ontology, covering every language: cost stays flat as tables grow
+ALLERGEN_MATCHER = _compile_allergen_matcher()
+HAZARD_MATCHER = _compile_hazard_matcher()
+ALLERGEN_ORDER = {key: i for i, key in enumerate(ALLERGEN_ONTOLOGY)}
+HAZARD_ORDER = {key: i for i, key in enumerate(HAZARD_ONTOLOGY)}
+
+PROFILE_KEY_LOOKUP = {}
+for _key, _data in ALLERGEN_ONTOLOGY.items():
+    # First ontology entry wins, same as scanning the ontology in order
+    PROFILE_KEY_LOOKUP.setdefault(_key, _key)
+    for _label in _data['labels']:
+        PROFILE_KEY_LOOKUP.setdefault(_label.lower(), _key)
+
+def resolve_user_profile(user_allergens: List[str]) -> List[str]:
+    """Maps the user's allergy list (keys or labels) onto ontology keys."""
     user_profile_keys = []
     for req in user_allergens:
         req = req.lower().strip()
-        mapped = False
-        for key, data in ALLERGEN_ONTOLOGY.items():
-            if req == key or req in [l.lower() for l in data['labels']]:
-                user_profile_keys.append(key)
-                mapped = True
-                break
-        if not mapped: user_profile_keys.append(req)
-
-    # 2. SCANNING LOOP
+        user_profile_keys.append(PROFILE_KEY_LOOKUP.get(req, req))
+    return user_profile_keys
+
+def match_ingredient_items(items: List[str]) -> Dict[str, Any]:
+    """
+    Profile-independent half of detection: which ontology entries each item hits.
+    The result only depends on the items, so it can be cached per product.
+    """
+    matched_allergens = {}
+    detected_hazards = {}
+
     for item in items:
-        # A. CHECK ALLERGENS
-        for key, data in ALLERGEN_ONTOLOGY.items():
-            for term in data['terms'] + data['aliases']:
-                match_found = False
-                
-                # Exact / Substring Match
-                if term in item:
-                    match_found = True
-                # Safe Fuzzy Match (Only for long words > 4 chars)
-                elif len(term) > 4:
-                    if difflib.SequenceMatcher(None, term, item).ratio() > 0.85:
-                        match_found = True
-                
-                if match_found:
-                    if key not in detected_allergens:
-                        detected_allergens[key] = { "found_terms": [], "is_direct_risk": False }
-                    detected_allergens[key]["found_terms"].append(item)
-                    
-                    if key in user_profile_keys:
-                        detected_allergens[key]["is_direct_risk"] = True
-                        found_personal_risk = True
-                    break # Move to next ontology key
-
-                # B. CHECK HAZARDS (The Cancer/Toxin Protocol)
-        for h_key, h_data in HAZARD_ONTOLOGY.items():
-            for term in h_data['terms']:
-                match_found = False
-                
-                # Exact match
-                if term in item:
-                    match_found = True
-                
-                # Looser Fuzzy match for chemicals
-                # Changed from len > 5 to len > 3 to catch "BHT", "Red 40"
-                # Changed ratio from 0.90 to 0.80 to catch typos
-                elif len(term) > 3: 
-                     if difflib.SequenceMatcher(None, term, item).ratio() > 0.80:
-                        match_found = True
-                
-                if match_found:
-                    if h_key not in detected_hazards:
-                        detected_hazards[h_key] = {
-                            "label": h_data["label"],
-                            "found_term": item,
-                            "danger_msg": h_data["danger"]
-                        }
-                        found_hazard_risk = True
-                    break
-
-    # 3. CALCULATE FINAL RISK & EXPLANATION
+        # A. CHECK ALLERGENS (exact / substring, or fuzzy)
+        for key in sorted(ALLERGEN_MATCHER.match(item), key=ALLERGEN_ORDER.get):
+            matched_allergens.setdefault(key, []).append(item)
+
+        # B. CHECK HAZARDS (The Cancer/Toxin Protocol)
+        for h_key in sorted(HAZARD_MATCHER.match(item), key=HAZARD_ORDER.get):
+            if h_key not in detected_hazards:
+                h_data = HAZARD_ONTOLOGY[h_key]
+                detected_hazards[h_key] = {
+                    "label": h_data["label"],
+                    "found_term": item,
+                    "danger_msg": h_data["danger"]
+                }
+
+    return {
+        "matched_allergens": matched_allergens,
+        "detected_hazards": detected_hazards
+    }
+
+def apply_user_profile(matches: Dict[str, Any], user_allergens: List[str]) -> Dict[str, Any]:
+    """Turns the output of match_ingredient_items into a risk verdict for one user."""
+    user_profile_keys = resolve_user_profile(user_allergens)
+
+    detected_allergens = {}
+    found_personal_risk = False
+    for key, found_terms in matches["matched_allergens"].items():
+        is_direct_risk = key in user_profile_keys
+        detected_allergens[key] = { "found_terms": list(found_terms), "is_direct_risk": is_direct_risk }
+        if is_direct_risk:
+            found_personal_risk = True
+
+    detected_hazards = {k: dict(v) for k, v in matches["detected_hazards"].items()}
+    found_hazard_risk = len(detected_hazards) > 0
+
+    # CALCULATE FINAL RISK & EXPLANATION
     risk_level = "LOW"
     summary = "Safe: No ingredients from your profile were detected."
 
@@ -343,4 +522,8 @@ def detect_allergens_from_ingredient_items(items: List[str], user_allergens: Lis
         "detected_allergens": detected_allergens,
         "detected_hazards": detected_hazards,
         "user_profile": user_profile_keys
-    }
\ No newline at end of file
+    }
+
+def detect_allergens_from_ingredient_items(items: List[str], user_allergens: List[str]) -> Dict[str, Any]:
+    # 1. SCAN (profile-independent)  2. APPLY THE USER'S PROFILE
+    return apply_user_profile(match_ingredient_items(items), user_allergens)
@@ -0,0 +1,23 @@
+# Production launch: gunicorn -c gunicorn.conf.py main:app
+import os
+
+from worker_runtime import mark_forked, seconds_since_start, process_memory_mb
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+# Each worker loads cv2/numpy and runs its own Tesseract, so memory, not cores, is the
+# usual limit. cpu_count() would report the host's cores inside a container, not the
+# cgroup quota - keep the default small and size it with WEB_CONCURRENCY.
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+# Import main (ontology tables, stub OCR corpus, ...) once in the master, then fork.
+# Workers share those pages copy-on-write instead of each building its own copy.
+preload_app = True
+
+def when_ready(server):
+    memory = process_memory_mb()
+    server.log.info(f"App preloaded in {seconds_since_start():.2f}s, master RSS {memory['rss_mb']} MB")
+
+def post_fork(server, worker):
+    mark_forked()
@@ -1,9 +1,104 @@
+import struct
 import cv2
 import numpy as np
 
-def preprocess_image_for_ocr(image_path):
-    # 1. READ
-    img = cv2.imread(image_path)
+# Longest side we OCR at. Anything bigger is shrunk first (memory & speed).
+WORKING_MAX_DIMENSION = 800
+
+# Magic bytes for the formats OpenCV can decode for us
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"BM", "bmp"),
+    (b"II*\x00", "tiff"),
+    (b"MM\x00*", "tiff"),
+]
+
+def sniff_image_format(header):
+    """Identifies the image type from its first bytes. Returns None if unsupported."""
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    for signature, fmt in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return fmt
+    return None
+
+def _jpeg_dimensions(data):
+    # Walk the marker segments until a Start-Of-Frame, which holds height/width
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # no length field
+            i += 2
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        segment_length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        i += 2 + segment_length
+    return None
+
+def _webp_dimensions(data):
+    chunk = data[12:16]
+    if chunk == b"VP8 " and len(data) >= 30:
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25:
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    return None
+
+def read_image_dimensions(data, fmt):
+    """Reads (width, height) straight from the file header, without decoding pixels."""
+    try:
+        if fmt == "png" and len(data) >= 24:
+            return struct.unpack(">II", data[16:24])
+        if fmt == "jpeg":
+            return _jpeg_dimensions(data)
+        if fmt == "webp":
+            return _webp_dimensions(data)
+        if fmt == "bmp" and len(data) >= 26:
+            width, height = struct.unpack("<ii", data[18:26])
+            return width, abs(height)
+    except struct.error:
+        return None
+    return None  # e.g. TIFF: let OpenCV work it out
+
+def reduced_decode_flag(dimensions, max_dimension=WORKING_MAX_DIMENSION):
+    """
+    Picks the biggest IMREAD_REDUCED_* factor that still leaves at least max_dimension px,
+    so a 12 MP phone photo is decoded at 1/4 scale instead of in full.
+    """
+    if dimensions is None:
+        return cv2.IMREAD_COLOR
+    longest = max(dimensions)
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if longest / factor >= max_dimension:
+            return flag
+    return cv2.IMREAD_COLOR
+
+def decode_image_for_ocr(data, dimensions=None, max_dimension=WORKING_MAX_DIMENSION):
+    """Decodes uploaded bytes (reduced-resolution when possible) and shrinks to the working size."""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    img = cv2.imdecode(buffer, reduced_decode_flag(dimensions, max_dimension))
+    if img is None: return None
+
+    height, width = img.shape[:2]
+    if max(height, width) > max_dimension:
+        scale = max_dimension / max(height, width)
+        img = cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return img
+
+def preprocess_image_for_ocr(image):
+    # 1. READ (accepts a file path or an already-decoded BGR image)
+    img = cv2.imread(image) if isinstance(image, str) else image
     if img is None: return None
 
     # 2. UPSCALE (Vital for small candy wrappers)
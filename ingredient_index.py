@@ -0,0 +1,188 @@
+import os
+import json
+import sqlite3
+import time
+import hashlib
+import threading
+from collections import Counter
+from typing import List, Dict, Any
+
+import allergen_engine
+from allergen_engine import match_ingredient_items, apply_user_profile
+
+# Where the product index lives. One SQLite file, shared by every scan.
+INDEX_PATH = os.environ.get("ALLERGY_INDEX_PATH", "ingredient_index.sqlite3")
+
+# A cache must never hold up a scan: give up on a locked database quickly
+DB_TIMEOUT_SECONDS = 1.0
+# Per-product hit counts are written in batches at most this often
+HIT_FLUSH_SECONDS = 30.0
+# Noisy OCR gives many one-off fingerprints: keep the most used products up to this many
+INDEX_MAX_ENTRIES = int(os.environ.get("ALLERGY_INDEX_MAX_ENTRIES", "50000"))
+# The cap is enforced every this many inserts, not on each one
+PRUNE_EVERY_INSERTS = 100
+
+# Any edit to the ontologies or to the matching rules (thresholds, MATCHER_VERSION)
+# changes this, so stale matches are never reused.
+ONTOLOGY_VERSION = hashlib.sha256(
+    json.dumps([
+        allergen_engine.ALLERGEN_ONTOLOGY,
+        allergen_engine.ALLERGEN_TERMS_I18N,
+        allergen_engine.I18N_TERM_EXCEPTIONS,
+        allergen_engine.HAZARD_ONTOLOGY,
+        allergen_engine.MATCHER_VERSION,
+        [allergen_engine.ALLERGEN_FUZZY_MIN_LEN, allergen_engine.ALLERGEN_FUZZY_RATIO],
+        [allergen_engine.HAZARD_FUZZY_MIN_LEN, allergen_engine.HAZARD_FUZZY_RATIO],
+    ], sort_keys=True).encode("utf-8")
+).hexdigest()[:16]
+
+def fingerprint_items(items: List[str]) -> str:
+    """
+    Canonical product fingerprint: the sorted, de-duplicated item set.
+    Two photos of the same label (different angle, crop, order) collapse to one key.
+    """
+    canonical = "\n".join(sorted(set(items)))
+    return hashlib.sha256(f"{ONTOLOGY_VERSION}\n{canonical}".encode("utf-8")).hexdigest()
+
+class IngredientIndex:
+    """
+    Maps product fingerprints to their profile-independent match result.
+    A known product skips all matching work; only the user's profile is re-applied.
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        # Hit counts are batched in memory, so a cache hit never takes the write lock
+        self._pending_hits = Counter()
+        self._last_flush = time.monotonic()
+        self._inserts = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite handles must not cross fork(): each worker process opens its own.
+        # WAL lets every worker read while one writes, so the file is a shared cache tier.
+        if self._conn_pid != os.getpid():
+            # New worker: counters inherited from the master belong to another process
+            self._conn, self._conn_pid = None, os.getpid()
+            self.hits = self.misses = self.errors = 0
+            self._pending_hits = Counter()
+            self._inserts = 0
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=DB_TIMEOUT_SECONDS, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(products)")}
+            if columns and "version" not in columns:
+                conn.execute("DROP TABLE products")  # pre-version layout; it is only a cache
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS products ("
+                " fingerprint TEXT PRIMARY KEY,"
+                " version TEXT NOT NULL,"
+                " matches TEXT NOT NULL,"
+                " hits INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL)"
+            )
+            # Rows from another ontology/matcher generation can never be hit again
+            conn.execute("DELETE FROM products WHERE version != ?", (ONTOLOGY_VERSION,))
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _prune(self, conn: sqlite3.Connection):
+        # Caller holds self._lock. Evicts the least used, then oldest, products beyond the cap.
+        self._flush_hits()  # rank on up-to-date hit counts
+        conn.execute(
+            "DELETE FROM products WHERE fingerprint IN ("
+            " SELECT fingerprint FROM products ORDER BY hits ASC, created_at ASC"
+            " LIMIT MAX(0, (SELECT COUNT(*) FROM products) - ?))",
+            (INDEX_MAX_ENTRIES,),
+        )
+
+    def _flush_hits(self):
+        # Caller holds self._lock
+        pending, self._pending_hits = self._pending_hits, Counter()
+        self._last_flush = time.monotonic()
+        if not pending: return
+        try:
+            conn = self._connection()
+            conn.executemany("UPDATE products SET hits = hits + ? WHERE fingerprint = ?",
+                             [(count, key) for key, count in pending.items()])
+            conn.commit()
+        except sqlite3.Error as e:
+            self.errors += 1
+            self._pending_hits.update(pending)  # retry on the next flush
+            print(f"⚠️ Ingredient index: could not flush hit counts ({e})")
+
+    def lookup(self, items: List[str]) -> Dict[str, Any]:
+        """
+        Returns the match result for these items, computing and storing it on a miss.
+        The index is only a cache: any database error falls back to matching directly.
+        """
+        key = fingerprint_items(items)
+        canonical_items = sorted(set(items))
+        try:
+            with self._lock:
+                row = self._connection().execute("SELECT matches FROM products WHERE fingerprint = ?", (key,)).fetchone()
+                if row is not None:
+                    matches = json.loads(row[0])
+                    self.hits += 1
+                    self._pending_hits[key] += 1
+                    if time.monotonic() - self._last_flush >= HIT_FLUSH_SECONDS:
+                        self._flush_hits()
+                    return matches
+        except (sqlite3.Error, ValueError) as e:
+            with self._lock:
+                self.errors += 1
+            print(f"⚠️ Ingredient index read failed, matching directly ({e})")
+            return match_ingredient_items(canonical_items)
+
+        # Miss: match on the canonical item set so the stored result depends only on the key
+        matches = match_ingredient_items(canonical_items)
+        with self._lock:
+            self.misses += 1
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR IGNORE INTO products (fingerprint, version, matches, created_at) VALUES (?, ?, ?, ?)",
+                    (key, ONTOLOGY_VERSION, json.dumps(matches), time.time()),
+                )
+                self._inserts += 1
+                if self._inserts % PRUNE_EVERY_INSERTS == 0:
+                    self._prune(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"⚠️ Ingredient index write failed ({e})")
+        return matches
+
+    def detect(self, items: List[str], user_allergens: List[str]) -> Dict[str, Any]:
+        """Drop-in for detect_allergens_from_ingredient_items, backed by the index."""
+        return apply_user_profile(self.lookup(items), user_allergens)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rates for this worker process, plus how often catalog entries were reused by all workers."""
+        with self._lock:
+            self._flush_hits()
+            try:
+                entries, total_hits = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM products"
+                ).fetchone()
+            except sqlite3.Error:
+                entries = total_hits = None
+        lookups = self.hits + self.misses
+        return {
+            "pid": os.getpid(),
+            "ontology_version": ONTOLOGY_VERSION,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "catalog_hits": total_hits,
+            "catalog_hit_rate": round(total_hits / (total_hits + entries), 4) if entries else 0.0,
+        }
@@ -0,0 +1,135 @@
+"""
+Load generator for the /scan endpoint.
+
+Start the API with the stub OCR backend to stress everything except Tesseract:
+    OCR_BACKEND=stub uvicorn main:app --port 10000
+Then run (needs `pip install -r requirements-dev.txt`):
+    python load_test.py --url http://localhost:10000 --concurrency 1,8,32 --requests 200
+"""
+import os
+import glob
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime
+
+import httpx
+
+TEST_IMAGE_DIR = "test_images"
+OUTPUT_FILE = "load_test_results.json"
+TEST_PROFILE = "milk,peanut,soy,gluten,egg,shellfish,wheat,corn,sesame"
+
+def load_corpus(image_dir):
+    """Reads every test image into memory so disk I/O doesn't skew client timings."""
+    image_files = []
+    for ext in ['*.jpg', '*.jpeg', '*.png', '*.JPG', '*.PNG']:
+        image_files.extend(glob.glob(os.path.join(image_dir, ext)))
+    corpus = []
+    for filepath in sorted(image_files):
+        with open(filepath, "rb") as f:
+            corpus.append((os.path.basename(filepath), f.read()))
+    return corpus
+
+def percentile(sorted_values, pct):
+    if not sorted_values: return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+async def run_scenario(client, url, corpus, concurrency, total_requests, allergens, budget_ms=0):
+    """Fires total_requests scans with at most `concurrency` in flight; returns the stats."""
+    latencies = []
+    errors = {}
+    degraded = 0
+    headers = {"X-Latency-Budget-Ms": str(budget_ms)} if budget_ms else {}
+    counter = iter(range(total_requests))
+
+    async def worker():
+        nonlocal degraded
+        for i in counter:
+            filename, data = corpus[i % len(corpus)]
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    f"{url}/scan",
+                    files={"file": (filename, data, "application/octet-stream")},
+                    data={"allergens": allergens},
+                    headers=headers,
+                )
+                outcome = "ok" if response.status_code == 200 else f"http_{response.status_code}"
+                if outcome == "ok" and response.json().get("degraded"):
+                    degraded += 1
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            elapsed = time.perf_counter() - started
+            if outcome == "ok":
+                latencies.append(elapsed)
+            else:
+                errors[outcome] = errors.get(outcome, 0) + 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall_time = time.perf_counter() - wall_start
+
+    latencies.sort()
+    error_count = sum(errors.values())
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "budget_ms": budget_ms,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(total_requests / wall_time, 2) if wall_time else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "error_rate": round(error_count / total_requests, 4) if total_requests else 0.0,
+        "errors": errors,
+        "degraded_rate": round(degraded / total_requests, 4) if total_requests else 0.0,
+    }
+
+async def run_load_test(args):
+    corpus = load_corpus(args.images)
+    if not corpus:
+        print(f"❌ No images found in '{args.images}'!")
+        return
+
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    print(f"--- STARTING LOAD TEST ({len(corpus)} images, levels {levels}) ---")
+
+    report = []
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        for level in levels:
+            print(f"Scenario: concurrency={level}, requests={args.requests}...", end="", flush=True)
+            stats = await run_scenario(client, args.url, corpus, level, args.requests, args.allergens, args.budget_ms)
+            print(f" {stats['throughput_rps']} req/s, p50={stats['p50_ms']}ms "
+                  f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms, errors={stats['error_rate']:.1%}, "
+                  f"degraded={stats['degraded_rate']:.1%}")
+            report.append(stats)
+
+    with open(args.output, "w", encoding='utf-8') as f:
+        json.dump({
+            "url": args.url,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "corpus_size": len(corpus),
+            "scenarios": report,
+        }, f, indent=2)
+
+    print("\n--- LOAD TEST COMPLETED ---")
+    print(f"📄 Saved to: {args.output}")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Drive /scan with a corpus of images.")
+    parser.add_argument("--url", default="http://localhost:10000")
+    parser.add_argument("--images", default=TEST_IMAGE_DIR)
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated levels, one scenario each")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--allergens", default=TEST_PROFILE)
+    parser.add_argument("--budget-ms", type=float, default=0, help="X-Latency-Budget-Ms sent with each scan (0 = none)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(run_load_test(parse_args()))
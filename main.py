@@ -1,19 +1,46 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-import shutil
 import os
+import math
+import time
+from typing import Optional
 import pytesseract
 import cv2
 import numpy as np
 
 # Import logic
-from allergen_engine import extract_ingredients_section, split_ingredients_list, detect_allergens_from_ingredient_items
-from image_processor import preprocess_image_for_ocr
+from allergen_engine import extract_ingredients_section, split_ingredients_list
+from image_processor import preprocess_image_for_ocr, sniff_image_format, read_image_dimensions, decode_image_for_ocr
+from ingredient_index import IngredientIndex
+from stub_ocr import StubOCR
+from upload_limit import UploadLimitMiddleware
+from profiling import install_profiling
+from worker_runtime import seconds_since_start, process_memory_mb
 
 # If running on Windows (your laptop), use the D: drive path
 if os.name == 'nt':
     pytesseract.pytesseract.tesseract_cmd = r"D:\Tesseract-OCR\tesseract.exe"
 
+OCR_CONFIG = r'--oem 3 --psm 6'
+
+# OCR_BACKEND=stub replays recorded text instead of calling Tesseract (load testing)
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "tesseract")
+stub_ocr = StubOCR() if OCR_BACKEND == "stub" else None
+
+# Upload limits: bytes on the wire, and pixels claimed by the image header
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 15 * 1024 * 1024))
+MAX_IMAGE_PIXELS = int(os.environ.get("MAX_IMAGE_PIXELS", 50_000_000))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # slack for boundaries and the allergens field
+HEADER_WINDOW_BYTES = 256 * 1024  # image dimensions must show up within this prefix
+
+# Per-request OCR deadline. Clients can override it with the header (0 = no deadline)
+SCAN_LATENCY_BUDGET_MS = float(os.environ.get("SCAN_LATENCY_BUDGET_MS", "0"))
+LATENCY_BUDGET_HEADER = "X-Latency-Budget-Ms"
+MAX_LATENCY_BUDGET_MS = 10 * 60 * 1000  # subprocess timeouts overflow on huge values
+MIN_PASS_SECONDS = 0.05  # not worth starting an OCR pass with less than this left
+OCR_TIMEOUT_MESSAGE = "Tesseract process timeout"
+
 app = FastAPI()
 
 app.add_middleware(
@@ -24,6 +51,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Enforced while the body streams in, before the multipart form is parsed to disk.
+# The handler's own chunked read below stays as a second line of defence.
+app.add_middleware(UploadLimitMiddleware, max_body_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES, paths=["/scan"])
+
+# Opt-in request tracing & stack sampling (PROFILE_ENABLED=1)
+install_profiling(app)
+
+# Product-level dedup: identical ingredient lists skip the matching loop
+ingredient_index = IngredientIndex()
+
 def score_ocr_text(text):
     """
     Scores the quality of the OCR text.
@@ -37,75 +74,194 @@ def score_ocr_text(text):
         score += 10
     return score
 
+def run_ocr(image, config, source_name, timeout=0):
+    """
+    Single entry point for every OCR pass, so the backend can be swapped.
+    A non-zero timeout (seconds) kills the Tesseract subprocess and raises RuntimeError.
+    """
+    if stub_ocr is not None:
+        return stub_ocr.image_to_string(source_name, timeout=timeout)
+    return pytesseract.image_to_string(image, config=config, timeout=timeout)
+
+class LatencyBudget:
+    """Deadline for one scan. A budget of 0 means unlimited (the old behaviour)."""
+
+    def __init__(self, budget_ms):
+        self.deadline = time.monotonic() + budget_ms / 1000.0 if budget_ms > 0 else None
+
+    def remaining(self):
+        if self.deadline is None: return None
+        return self.deadline - time.monotonic()
+
+    def allows_pass(self):
+        remaining = self.remaining()
+        return remaining is None or remaining > MIN_PASS_SECONDS
+
+    def ocr_timeout(self):
+        # pytesseract treats 0 as "no timeout"
+        remaining = self.remaining()
+        return 0 if remaining is None else max(remaining, MIN_PASS_SECONDS)
+
+def parse_latency_budget(header_value):
+    if header_value is None:
+        return SCAN_LATENCY_BUDGET_MS
+    try:
+        budget_ms = float(header_value)
+    except ValueError:
+        budget_ms = math.nan
+    if not math.isfinite(budget_ms) or budget_ms > MAX_LATENCY_BUDGET_MS:
+        raise HTTPException(status_code=400, detail=f"Invalid {LATENCY_BUDGET_HEADER} header: {header_value!r} "
+                                                    f"(expected 0-{MAX_LATENCY_BUDGET_MS} ms)")
+    return max(0.0, budget_ms)
+
+def check_image_dimensions(dimensions):
+    if dimensions is not None and dimensions[0] * dimensions[1] > MAX_IMAGE_PIXELS:
+        raise HTTPException(status_code=413, detail=f"Image is {dimensions[0]}x{dimensions[1]}, above the {MAX_IMAGE_PIXELS} pixel limit.")
+
+async def read_upload_bounded(file: UploadFile):
+    """
+    Reads the upload in chunks, never holding more than MAX_UPLOAD_BYTES.
+    Unknown formats are rejected on the first chunk; oversized images as soon as
+    the header carrying their dimensions has arrived.
+    Returns (bytes, format, (width, height) or None).
+    """
+    chunks = []
+    total = 0
+    fmt = None
+    dimensions = None
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk: break
+        total += len(chunk)
+        if total > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes.")
+        if fmt is None:
+            fmt = sniff_image_format(chunk)
+            if fmt is None:
+                raise HTTPException(status_code=415, detail="Unsupported file type. Upload a JPEG, PNG, WEBP, BMP or TIFF image.")
+        chunks.append(chunk)
+        # JPEG dimensions can sit behind a large EXIF block, so keep looking for a while
+        if dimensions is None and total <= HEADER_WINDOW_BYTES:
+            dimensions = read_image_dimensions(chunk if len(chunks) == 1 else b"".join(chunks), fmt)
+            check_image_dimensions(dimensions)
+
+    if not chunks:
+        raise HTTPException(status_code=400, detail="Empty upload.")
+
+    data = b"".join(chunks)
+    if dimensions is None:
+        dimensions = read_image_dimensions(data, fmt)
+        check_image_dimensions(dimensions)
+    return data, fmt, dimensions
+
+worker_info = {}
+
+@app.on_event("startup")
+def warm_up_worker():
+    """
+    Runs once per worker after fork. A throwaway OCR call makes Tesseract's binary and
+    language data hot before the first real scan, instead of charging that to a user.
+    """
+    warmup_started = time.monotonic()
+    try:
+        run_ocr(np.full((32, 128), 255, dtype=np.uint8), OCR_CONFIG, "warmup")
+    except Exception as e:
+        print(f"⚠️ OCR warm-up failed: {e}")
+    worker_info.update({
+        "pid": os.getpid(),
+        "ocr_backend": OCR_BACKEND,
+        "warmup_seconds": round(time.monotonic() - warmup_started, 3),
+        "startup_seconds": round(seconds_since_start(), 3),
+    })
+    memory = process_memory_mb()
+    print(f"👷 Worker {os.getpid()} ready in {worker_info['startup_seconds']}s "
+          f"(OCR warm-up {worker_info['warmup_seconds']}s), RSS {memory['rss_mb']} MB, PSS {memory['pss_mb']} MB")
+
+@app.get("/worker")
+def worker_stats():
+    return {**worker_info, **process_memory_mb()}
+
 @app.get("/")
 def home():
     return {"message": "Food Allergy Sentinel API is Running!"}
 
+@app.get("/index/stats")
+def index_stats():
+    return ingredient_index.stats()
+
 @app.post("/scan")
 async def scan_food(
     file: UploadFile = File(...), 
-    allergens: str = Form(...) 
+    allergens: str = Form(...),
+    x_latency_budget_ms: Optional[str] = Header(None)
 ):
-    temp_filename = f"temp_{file.filename}"
-    
+    budget = LatencyBudget(parse_latency_budget(x_latency_budget_ms))
+
     try:
-        # 1. Save locally
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # 2. Resizing (Critical for Memory & Speed)
-        img = cv2.imread(temp_filename)
-        height, width = img.shape[:2]
-        max_dimension = 800  # Reduced to 800px for SPEED
-
-        if max(height, width) > max_dimension:
-            scale = max_dimension / max(height, width)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
-            cv2.imwrite(temp_filename, img)
-
-        # 3. SPEED OPTIMIZED OCR STRATEGY
-        custom_config = r'--oem 3 --psm 6'
-        best_text = ""
-        
+        # 1. Stream the upload in (bounded), rejecting junk before it is decoded
+        data, fmt, dimensions = await read_upload_bounded(file)
+
+        # 2. Decode at reduced resolution & shrink (Critical for Memory & Speed)
+        img = decode_image_for_ocr(data, dimensions)
+        if img is None:
+            raise HTTPException(status_code=415, detail=f"Could not decode {fmt} image.")
+
+        # 3. SPEED OPTIMIZED OCR STRATEGY (within the request's latency budget)
+        passes = []  # (name, text, score) for every pass that finished
+        degraded = False
+
+        def ocr_pass(name, image):
+            nonlocal degraded
+            try:
+                text = run_ocr(image, OCR_CONFIG, file.filename, timeout=budget.ocr_timeout())
+            except RuntimeError as e:
+                # pytesseract kills the subprocess and raises exactly this on timeout
+                if str(e) != OCR_TIMEOUT_MESSAGE: raise
+                print(f"⏱️ Pass '{name}' cut off by latency budget")
+                degraded = True
+                return 0
+            score = score_ocr_text(text)
+            passes.append((name, text, score))
+            return score
+
         # --- PASS 1: Raw Grayscale ---
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        text_1 = pytesseract.image_to_string(gray, config=custom_config)
-        score_1 = score_ocr_text(text_1)
+        score_1 = ocr_pass("raw", gray)
 
         # === EARLY EXIT (THE SPEED FIX) ===
         # If Pass 1 is good, we SKIP Pass 2 and 3. This saves 40 seconds on Cloud.
         if score_1 > 40:
             print(f"⚡ Fast Pass 1 Successful (Score: {score_1})")
-            best_text = text_1
+        elif not budget.allows_pass():
+            print("⏱️ Latency budget spent. Skipping Pass 2 and 3.")
+            degraded = True
         else:
             # Only do the hard work if Pass 1 failed
             print("⚠️ Pass 1 Low Confidence. Trying Pass 2...")
             
             # Pass 2: Processed
-            processed_img = preprocess_image_for_ocr(temp_filename)
-            text_2 = pytesseract.image_to_string(processed_img, config=custom_config)
-            score_2 = score_ocr_text(text_2)
-
-            # Pass 3: Inverted (Only if Pass 2 is also bad)
-            if score_2 < 40:
-                print("⚠️ Pass 2 Low Confidence. Trying Pass 3 (Inverted)...")
-                inverted_gray = cv2.bitwise_not(gray)
-                inverted_gray = cv2.threshold(inverted_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-                text_3 = pytesseract.image_to_string(inverted_gray, config=custom_config)
-                score_3 = score_ocr_text(text_3)
+            processed_img = preprocess_image_for_ocr(img)
+            if not budget.allows_pass():
+                print("⏱️ Latency budget spent. Skipping Pass 2 and 3.")
+                degraded = True
             else:
-                text_3 = ""
-                score_3 = 0
-
-            # Pick Winner
-            if score_3 >= score_1 and score_3 >= score_2:
-                best_text = text_3
-            elif score_2 >= score_1:
-                best_text = text_2
-            else:
-                best_text = text_1
+                score_2 = ocr_pass("processed", processed_img)
+
+                # Pass 3: Inverted (Only if Pass 2 is also bad)
+                if score_2 < 40 and not budget.allows_pass():
+                    print("⏱️ Latency budget spent. Skipping Pass 3.")
+                    degraded = True
+                elif score_2 < 40:
+                    print("⚠️ Pass 2 Low Confidence. Trying Pass 3 (Inverted)...")
+                    inverted_gray = cv2.bitwise_not(gray)
+                    inverted_gray = cv2.threshold(inverted_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+                    ocr_pass("inverted", inverted_gray)
+
+        if not passes:
+            raise HTTPException(status_code=504, detail="Latency budget exhausted before any OCR pass finished.")
+
+        # Pick Winner (highest score; ties go to the later, more processed pass)
+        _, best_text, _ = max(reversed(passes), key=lambda p: p[2])
 
         # 4. LOGIC PIPELINE
         ingredients_text = extract_ingredients_section(best_text)
@@ -119,20 +275,21 @@ async def scan_food(
         else:
             user_allergen_list = [x.strip().lower() for x in allergens.split(",")]
         
-        analysis = detect_allergens_from_ingredient_items(items, user_allergen_list)
+        analysis = ingredient_index.detect(items, user_allergen_list)
 
         # 5. RETURN WRAPPER (THE DATA FORMAT FIX)
         # We wrap it in { status, analysis } so the Frontend understands it.
         return {
             "status": "success",
             "text_preview": best_text[:300],
+            "degraded": degraded,
+            "passes_run": [name for name, _, _ in passes],
             "analysis": analysis
         }
 
+    except HTTPException:
+        raise
+
     except Exception as e:
         print(f"ERROR: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    finally:
-        if os.path.exists(temp_filename):
-            os.remove(temp_filename)
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
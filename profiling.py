@@ -0,0 +1,188 @@
+"""
+Opt-in profiling for the API. Nothing is installed unless PROFILE_ENABLED=1.
+
+Per-request traces (pyinstrument if installed, otherwise cProfile):
+    PROFILE_SAMPLE_RATE=0.01   profile ~1% of /scan requests
+    X-Profile: <PROFILE_TOKEN> header profiles that one request on demand (needs PROFILE_TOKEN set)
+    PROFILE_MAX_TRACES=50      oldest trace files are deleted beyond this
+Background stack sampling (one folded-stack file per worker, flamegraph.pl/speedscope ready):
+    PROFILE_STACK_INTERVAL_MS=10   0 disables it
+Merge every worker's samples into one file:
+    python profiling.py merge
+"""
+import os
+import sys
+import glob
+import hmac
+import time
+import random
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_HEADER = "x-profile"
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_MAX_TRACES = int(os.environ.get("PROFILE_MAX_TRACES", "50"))
+PROFILE_PATHS = ["/scan"]
+STACK_INTERVAL_MS = float(os.environ.get("PROFILE_STACK_INTERVAL_MS", "10"))
+STACK_FLUSH_SECONDS = float(os.environ.get("PROFILE_STACK_FLUSH_SECONDS", "60"))
+MERGED_STACKS_FILE = "stacks-merged.folded"
+
+# cProfile can only have one active profiler per interpreter; overlapping requests are skipped
+_trace_lock = threading.Lock()
+
+def should_profile(request):
+    if request.url.path not in PROFILE_PATHS:
+        return False
+    # On-demand traces need a configured token; otherwise any client could force them
+    requested = request.headers.get(PROFILE_HEADER)
+    if PROFILE_TOKEN and requested is not None and hmac.compare_digest(requested, PROFILE_TOKEN):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def _trace_path(extension):
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(PROFILE_DIR, f"scan-{stamp}-{os.getpid()}.{extension}")
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+def _prune_traces():
+    # Keeps the newest PROFILE_MAX_TRACES files across all workers
+    traces = sorted(glob.glob(os.path.join(PROFILE_DIR, "scan-*")), key=_mtime)
+    for path in traces[:max(0, len(traces) - PROFILE_MAX_TRACES)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # another worker got there first
+
+async def profile_request(request, call_next):
+    """HTTP middleware: runs the request under a profiler when it is sampled."""
+    if not should_profile(request) or not _trace_lock.acquire(blocking=False):
+        return await call_next(request)
+    try:
+        if Profiler is not None:
+            profiler = Profiler(async_mode="enabled")
+            profiler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                profiler.stop()
+            path = _trace_path("html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                response = await call_next(request)
+            finally:
+                profiler.disable()
+            path = _trace_path("prof")
+            profiler.dump_stats(path)
+        _prune_traces()
+    finally:
+        _trace_lock.release()
+    response.headers["X-Profile-File"] = os.path.basename(path)
+    return response
+
+class StackSampler:
+    """
+    Samples every thread's Python stack at a fixed interval and periodically
+    writes the counts as folded stacks ("frame;frame;frame count") for this process.
+    """
+
+    def __init__(self, interval_ms=STACK_INTERVAL_MS, flush_seconds=STACK_FLUSH_SECONDS):
+        self.interval = interval_ms / 1000.0
+        self.flush_seconds = flush_seconds
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def path(self):
+        return os.path.join(PROFILE_DIR, f"stacks-{os.getpid()}.folded")
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        last_flush = time.monotonic()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.counts[";".join(reversed(stack))] += 1
+            if time.monotonic() - last_flush >= self.flush_seconds:
+                self.flush()
+                last_flush = time.monotonic()
+
+    def flush(self):
+        # Rewrites the whole file: counts are cumulative for the life of the worker
+        counts = self.counts.copy()
+        if not counts: return
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+def merge_stack_files(directory=PROFILE_DIR):
+    """Sums every worker's folded stacks into one flamegraph input file."""
+    merged = Counter()
+    for path in glob.glob(os.path.join(directory, "stacks-*.folded")):
+        if os.path.basename(path) == MERGED_STACKS_FILE:
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                stack, _, count = line.rstrip("\n").rpartition(" ")
+                if stack and count.isdigit():
+                    merged[stack] += int(count)
+    out_path = os.path.join(directory, MERGED_STACKS_FILE)
+    with open(out_path, "w", encoding="utf-8") as f:
+        for stack, count in merged.most_common():
+            f.write(f"{stack} {count}\n")
+    return out_path
+
+def install_profiling(app):
+    """Wires profiling into the FastAPI app. A no-op unless PROFILE_ENABLED=1."""
+    if not PROFILE_ENABLED:
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    app.middleware("http")(profile_request)
+
+    if STACK_INTERVAL_MS > 0:
+        sampler = StackSampler()
+        # Started per worker on startup, so each forked process samples itself.
+        # Same hook as main.py's warm-up: FastAPI.add_event_handler is gone in newer releases
+        app.on_event("startup")(sampler.start)
+        app.on_event("shutdown")(sampler.stop)
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["merge"]:
+        print(f"📄 Saved to: {merge_stack_files()}")
+    else:
+        print(__doc__)
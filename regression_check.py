@@ -0,0 +1,107 @@
+"""
+Guards the compiled matcher against false alarms from the localized term tables.
+
+Runs common (allergen-free in the baseline engine) ingredient words through
+both the original English-only per-term scan and match_ingredient_items, and
+fails if the new engine flags anything the original did not. Also checks that
+localized allergen words are still caught, and not under the wrong key. Run after editing ALLERGEN_TERMS_I18N:
+    python regression_check.py
+"""
+import sys
+import difflib
+
+from allergen_engine import ALLERGEN_ONTOLOGY, HAZARD_ONTOLOGY, split_ingredients_list, match_ingredient_items
+
+# Everyday ingredients in the label languages, plus words that once collided with short terms
+COMMON_INGREDIENTS = [
+    # English
+    "sugar", "salt", "water", "sunflower oil", "rapeseed oil", "olive oil", "rice", "rice flour",
+    "tapioca starch", "potato starch", "natamycin", "citric acid", "ascorbic acid", "lactic acid",
+    "sodium bicarbonate", "baking powder", "yeast", "vinegar", "honey", "cocoa butter", "cocoa mass",
+    "vanilla extract", "natural flavour", "turmeric", "cumin", "coriander", "black pepper", "garlic",
+    "onion", "ginger", "cinnamon", "cardamom", "clove", "nutmeg", "fenugreek", "asafoetida",
+    "kerala matta rice", "basmati rice", "jaggery", "cane sugar", "glucose syrup", "invert sugar",
+    "pectin", "agar", "carrageenan", "xanthan gum", "guar gum", "gum arabic", "sorbitol", "mannitol",
+    "stevia", "sucralose", "caramel colour", "beetroot red", "paprika extract", "pulp", "mango pulp",
+    "pita", "forge", "attar", "rose attar", "orange juice", "apple puree", "lemon juice", "coconut",
+    "coconut milk powder", "raisins", "dates", "apricot", "strawberry", "raspberry", "blueberry",
+    "cherry", "grape", "pineapple", "mango", "papad", "poha", "sago",
+    "potassium sorbate", "sodium benzoate", "calcium carbonate", "iron", "zinc oxide", "vitamin c",
+    "emulsifier", "stabiliser", "thickener", "acidity regulator", "raising agent", "antioxidant",
+    # German / Dutch
+    "zucker", "salz", "wasser", "sonnenblumenöl", "reis", "kartoffelstärke", "hefe", "essig",
+    "zitronensäure", "kakaobutter", "suiker", "zout", "water", "zonnebloemolie", "rijst", "gist", "azijn",
+    "Milchsäure", "melkzuur", "Erbseneiweiß", "erwteneiwit",
+    # French / Spanish / Italian
+    "sucre", "sel", "eau", "huile de tournesol", "riz", "amidon de pomme de terre", "levure", "vinaigre",
+    "laitue", "chocolat moulé", "azúcar", "sal", "agua", "aceite de girasol", "arroz", "levadura",
+    "vinagre", "zucchero", "sale", "acqua", "olio di girasole", "riso", "lievito", "aceto",
+    # Hindi
+    "चीनी", "नमक", "पानी", "चावल", "हल्दी", "जीरा", "तिलहन",
+]
+
+# (ingredient as printed, ontology key it must still be flagged as)
+LOCALIZED_ALLERGENS = [
+    ("Vollmilchpulver", "milk"), ("Haselnüsse", "tree_nut"), ("Sojalecithin", "soy"), ("Weizenmehl", "wheat_gluten"),
+    ("melkpoeder", "milk"), ("tarwebloem", "wheat_gluten"),
+    ("Hühnereiweiß", "egg"), ("Eiklar", "egg"), ("kippeneiwit", "egg"), ("Frischkäse", "milk"), ("Hartkäse", "milk"), ("Schmelzkäse", "milk"), ("roomkaas", "milk"), ("geitenkaas", "milk"),
+    ("lait écrémé", "milk"), ("noisettes", "tree_nut"), ("farine de blé", "wheat_gluten"), ("œufs", "egg"),
+    ("leche en polvo", "milk"), ("huevos", "egg"), ("harina de trigo", "wheat_gluten"), ("apio", "celery"),
+    ("latte in polvere", "milk"), ("nocciole", "tree_nut"), ("uova", "egg"),
+    ("दूध पाउडर", "milk"), ("गेहूं का आटा", "wheat_gluten"), ("तिल", "sesame"), ("राई", "mustard"),
+    ("atta", "wheat_gluten"), ("kaju", "tree_nut"), ("suji", "wheat_gluten"),
+    ("Bio-Soja", "soy"), ("lait/crème", "milk"), ("farine de blé-complet", "wheat_gluten"),
+]
+
+# (ingredient as printed, ontology key it must not be flagged as) - words that hold an
+# allergen, but not the one a localized term inside them suggests
+FALSE_FRIENDS = [
+    ("Milcheiweiß", "egg"), ("Sojaeiweiß", "egg"), ("melkeiwit", "egg"), ("sojaeiwit", "egg"),
+]
+
+def baseline_match(item):
+    """The original English-only scan: every raw term of every key, substring then fuzzy."""
+    allergens, hazards = set(), set()
+    for key, data in ALLERGEN_ONTOLOGY.items():
+        for term in data['terms'] + data['aliases']:
+            if term in item or (len(term) > 4 and difflib.SequenceMatcher(None, term, item).ratio() > 0.85):
+                allergens.add(key)
+                break
+    for h_key, h_data in HAZARD_ONTOLOGY.items():
+        for term in h_data['terms']:
+            if term in item or (len(term) > 3 and difflib.SequenceMatcher(None, term, item).ratio() > 0.80):
+                hazards.add(h_key)
+                break
+    return allergens, hazards
+
+def run_regression_check():
+    failures = []
+
+    for word in COMMON_INGREDIENTS:
+        for item in split_ingredients_list(word):
+            old_allergens, old_hazards = baseline_match(item)
+            result = match_ingredient_items([item])
+            extra = (set(result["matched_allergens"]) - old_allergens) | (set(result["detected_hazards"]) - old_hazards)
+            if extra:
+                failures.append(f"'{word}' newly flagged as {sorted(extra)}")
+
+    for word, key in LOCALIZED_ALLERGENS:
+        items = split_ingredients_list(word)
+        if key not in match_ingredient_items(items)["matched_allergens"]:
+            failures.append(f"'{word}' no longer flagged as {key}")
+
+    for word, key in FALSE_FRIENDS:
+        items = split_ingredients_list(word)
+        if key in match_ingredient_items(items)["matched_allergens"]:
+            failures.append(f"'{word}' wrongly flagged as {key}")
+
+    print(f"Checked {len(COMMON_INGREDIENTS)} common ingredients, {len(LOCALIZED_ALLERGENS)} localized allergens, "
+          f"{len(FALSE_FRIENDS)} false friends.")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ No regressions.")
+    return not failures
+
+if __name__ == "__main__":
+    sys.exit(0 if run_regression_check() else 1)
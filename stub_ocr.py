@@ -0,0 +1,59 @@
+import os
+import glob
+import json
+import time
+import zlib
+
+# Recorded OCR output from earlier batch runs (batch_test.py writes these)
+RESULTS_GLOB = os.environ.get("OCR_STUB_RESULTS", "batch_test_results*.json")
+
+# Optional artificial latency per OCR call, to mimic a Tesseract subprocess
+STUB_DELAY_MS = float(os.environ.get("OCR_STUB_DELAY_MS", "0"))
+
+# Newer runs store "ocr_sample"; older ones only kept the full text or a snippet
+TEXT_FIELDS = ["ocr_sample", "full_ocr_text", "ocr_snippet"]
+
+def load_recorded_texts(pattern=RESULTS_GLOB):
+    """Returns {filename: recorded_text} from every matching batch results file."""
+    recorded = {}
+    for path in sorted(glob.glob(pattern)):
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        for entry in entries:
+            filename = entry.get("filename")
+            if not filename or filename in recorded:
+                continue
+            for field in TEXT_FIELDS:
+                if entry.get(field):
+                    recorded[filename] = entry[field]
+                    break
+    return recorded
+
+class StubOCR:
+    """
+    Deterministic stand-in for pytesseract. Known filenames get their recorded text;
+    anything else is mapped onto the corpus by a stable hash of its name.
+    """
+
+    def __init__(self, pattern=RESULTS_GLOB, delay_ms=STUB_DELAY_MS):
+        self.recorded = load_recorded_texts(pattern)
+        if not self.recorded:
+            raise RuntimeError(f"Stub OCR found no recorded text in '{pattern}'")
+        self._names = sorted(self.recorded)
+        self.delay_ms = delay_ms
+
+    def text_for(self, source_name):
+        if source_name in self.recorded:
+            return self.recorded[source_name]
+        index = zlib.crc32((source_name or "").encode("utf-8")) % len(self._names)
+        return self.recorded[self._names[index]]
+
+    def image_to_string(self, source_name, timeout=0):
+        """Mirrors pytesseract: a call slower than `timeout` seconds raises RuntimeError."""
+        delay = self.delay_ms / 1000.0
+        if timeout and delay > timeout:
+            time.sleep(timeout)
+            raise RuntimeError("Tesseract process timeout")
+        if delay > 0:
+            time.sleep(delay)
+        return self.text_for(source_name)
@@ -0,0 +1,162 @@
+import difflib
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+from unicodedata import category
+
+# Where a term may sit inside an item
+SUBSTRING = "substring"    # anywhere ("whey" in "wheypowder")
+WORD_START = "word_start"  # must begin a word, may run on ("noisette" in "noisettes")
+WHOLE_WORD = "whole_word"  # must be a word of its own ("apio", but not in "tapioca")
+
+class Term(NamedTuple):
+    text: str
+    key: str
+    boundary: str = SUBSTRING
+    fuzzy: bool = True  # also eligible for the fuzzy pass
+    exceptions: Tuple[str, ...] = ()  # longer words containing the term that are not a match
+
+def _masks(term: Term) -> Tuple[Tuple[int, str], ...]:
+    # (offset of the term inside the word, word) for every occurrence
+    masks = []
+    for word in term.exceptions:
+        offset = word.find(term.text)
+        while offset != -1:
+            masks.append((offset, word))
+            offset = word.find(term.text, offset + 1)
+    return tuple(masks)
+
+def _is_word_char(ch: str) -> bool:
+    # Vowel signs (category M) belong to the word in Indic scripts
+    return ch.isalnum() or category(ch).startswith("M")
+
+def _bigrams(text: str) -> Dict[str, int]:
+    counts = defaultdict(int)
+    for i in range(len(text) - 1):
+        counts[text[i:i + 2]] += 1
+    return counts
+
+class TermMatcher:
+    """
+    Every (term, key) pair of every language compiled into one structure.
+
+    match(item) returns the keys whose terms either occur inside the item
+    (substring, or on word boundaries - see Term.boundary) or are a fuzzy match
+    for it (difflib ratio > fuzzy_ratio, fuzzy terms longer than fuzzy_min_len
+    only) - the same rule as scanning each term list in turn, but the cost no
+    longer grows with the number of terms:
+
+    - substrings: one Aho-Corasick pass over the item
+    - fuzzy: a bigram index proposes candidates; only those that can still
+      reach the ratio are handed to SequenceMatcher
+    """
+
+    def __init__(self, entries: Iterable[Term], fuzzy_min_len: int, fuzzy_ratio: float):
+        self.fuzzy_min_len = fuzzy_min_len
+        self.fuzzy_ratio = fuzzy_ratio
+
+        # Aho-Corasick automaton
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, int, str, tuple]]] = [[]]  # (key, length, boundary, masks)
+
+        # Fuzzy index: bigram -> [(term_id, count)]
+        self._fuzzy_terms: List[Tuple[str, Set[str]]] = []
+        self._fuzzy_ids: Dict[str, int] = {}
+        self._bigram_index: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+        for term in entries:
+            if not term.text: continue
+            self._add_substring(term)
+            if term.fuzzy and len(term.text) > fuzzy_min_len:
+                self._add_fuzzy(term.text, term.key)
+        self._build_failure_links()
+
+    # --- construction -------------------------------------------------------
+
+    def _add_substring(self, term: Term):
+        node = 0
+        for ch in term.text:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        output = (term.key, len(term.text), term.boundary, _masks(term))
+        if output not in self._out[node]:
+            self._out[node].append(output)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def _add_fuzzy(self, term: str, key: str):
+        term_id = self._fuzzy_ids.get(term)
+        if term_id is not None:
+            self._fuzzy_terms[term_id][1].add(key)
+            return
+        term_id = len(self._fuzzy_terms)
+        self._fuzzy_ids[term] = term_id
+        self._fuzzy_terms.append((term, {key}))
+        for gram, count in _bigrams(term).items():
+            self._bigram_index[gram].append((term_id, count))
+
+    # --- matching -----------------------------------------------------------
+
+    def _substring_keys(self, item: str) -> Set[str]:
+        keys = set()
+        node = 0
+        last = len(item) - 1
+        for end, ch in enumerate(item):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for key, length, boundary, masks in self._out[node]:
+                start = end - length + 1
+                if masks and any(item.startswith(word, start - offset) for offset, word in masks if start >= offset):
+                    continue
+                if boundary != SUBSTRING:
+                    if start > 0 and _is_word_char(item[start - 1]): continue
+                    if boundary == WHOLE_WORD and end < last and _is_word_char(item[end + 1]): continue
+                keys.add(key)
+        return keys
+
+    def _min_shared_bigrams(self, total_len: int) -> int:
+        # ratio = 2M / total_len, so a match needs M matched characters, spread over
+        # B matching blocks with B <= (total_len - 2M) + 1. Each block of length L
+        # shares L - 1 bigrams, hence at least M - B = 3M - total_len - 1 shared.
+        needed_chars = int(self.fuzzy_ratio * total_len / 2) + 1
+        return max(1, 3 * needed_chars - total_len - 1)
+
+    def _fuzzy_keys(self, item: str) -> Set[str]:
+        shared = defaultdict(int)
+        for gram, item_count in _bigrams(item).items():
+            for term_id, term_count in self._bigram_index.get(gram, ()):
+                shared[term_id] += min(item_count, term_count)
+
+        keys = set()
+        item_len = len(item)
+        for term_id, count in shared.items():
+            term, term_keys = self._fuzzy_terms[term_id]
+            if term_keys <= keys: continue
+            total_len = len(term) + item_len
+            # real_quick_ratio bound, then the bigram bound, then the real thing
+            if 2.0 * min(len(term), item_len) / total_len <= self.fuzzy_ratio: continue
+            if count < self._min_shared_bigrams(total_len): continue
+            if difflib.SequenceMatcher(None, term, item).ratio() > self.fuzzy_ratio:
+                keys |= term_keys
+        return keys
+
+    def match(self, item: str) -> Set[str]:
+        """Returns every key with a term matching this ingredient item."""
+        return self._substring_keys(item) | self._fuzzy_keys(item)
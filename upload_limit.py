@@ -0,0 +1,63 @@
+import json
+
+from fastapi import HTTPException
+
+class UploadLimitMiddleware:
+    """
+    Caps request bodies on the ASGI receive stream, before FastAPI parses the
+    multipart form (which would otherwise spool the whole upload to disk first).
+    A declared Content-Length over the cap is refused without reading anything;
+    chunked bodies are counted as they arrive and aborted once over the cap.
+    """
+
+    def __init__(self, app, max_body_bytes, paths):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.paths = set(paths)
+
+    def _detail(self):
+        return f"Upload exceeds {self.max_body_bytes} bytes."
+
+    async def _send_413(self, send):
+        body = json.dumps({"detail": self._detail()}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            await self._send_413(send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # FastAPI re-raises HTTPException from body parsing, so this becomes a 413
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as e:
+            if e.status_code != 413 or response_started: raise
+            await self._send_413(send)
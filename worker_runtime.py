@@ -0,0 +1,43 @@
+import time
+
+# Imported by gunicorn.conf.py in the master, so this is (roughly) server start time
+PROCESS_STARTED_AT = time.monotonic()
+
+# Set in each worker right after fork (see gunicorn.conf.py post_fork)
+FORKED_AT = None
+
+def mark_forked():
+    global FORKED_AT
+    FORKED_AT = time.monotonic()
+
+def seconds_since_start():
+    """Worker: time since fork. Single-process (plain uvicorn): time since import."""
+    return time.monotonic() - (FORKED_AT if FORKED_AT is not None else PROCESS_STARTED_AT)
+
+def _read_proc_kb(path, field):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+def process_memory_mb():
+    """
+    RSS counts copy-on-write pages shared with the master in full; PSS splits them
+    between the processes sharing them, so it is the honest per-worker cost (Linux only).
+    """
+    rss_kb = _read_proc_kb("/proc/self/status", "VmRSS")
+    pss_kb = _read_proc_kb("/proc/self/smaps_rollup", "Pss")
+    if rss_kb is None:
+        try:
+            import resource
+            rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:  # Windows
+            pass
+    return {
+        "rss_mb": round(rss_kb / 1024, 1) if rss_kb is not None else None,
+        "pss_mb": round(pss_kb / 1024, 1) if pss_kb is not None else None,
+    }